@@ -1,8 +1,12 @@
 import boto3
+from botocore.exceptions import ClientError
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+import csv
 import io
 import os
-from typing import List
+from typing import Dict, List, Optional
 
 # Import secrets
 try:
@@ -55,6 +59,25 @@ class S3Helper:
         except Exception as e:
             raise RuntimeError(f"Error listing files: {str(e)}")
 
+    def latest_file(self, prefix: str = "") -> Optional[str]:
+        """Return the most recently modified key under a prefix, or None."""
+        try:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            pages = paginator.paginate(
+                Bucket=self.bucket_name,
+                Prefix=prefix,
+                PaginationConfig={"PageSize": 1000},
+            )
+            objects = (obj for page in pages for obj in page.get("Contents", []))
+            latest = max(
+                objects,
+                key=lambda obj: (obj["LastModified"], obj["Key"]),
+                default=None,
+            )
+            return latest["Key"] if latest else None
+        except Exception as e:
+            raise RuntimeError(f"Error finding latest file: {str(e)}")
+
     def read_csv_from_s3(self, key: str, **pandas_kwargs) -> pd.DataFrame:
         """Read CSV file from S3 into DataFrame."""
         try:
@@ -63,6 +86,65 @@ class S3Helper:
         except Exception as e:
             raise RuntimeError(f"Error reading CSV from S3: {str(e)}")
 
+    def read_arrow_csv_from_s3(
+        self,
+        key: str,
+        timestamp_columns: List[str] = None,
+        column_types: Dict[str, pa.DataType] = None,
+        columns: List[str] = None,
+    ) -> pd.DataFrame:
+        """Read CSV file from S3 with PyArrow's multithreaded parser, optionally keeping only columns."""
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            # Explicit types skip inference for those columns and pin ambiguous ones
+            types = {col: pa.timestamp("ns") for col in timestamp_columns or []}
+            types.update(column_types or {})
+            convert_options = pa_csv.ConvertOptions(
+                column_types=types, include_columns=columns
+            )
+            # Parse straight from the streaming body in threaded blocks rather
+            # than buffering a full copy of the payload first
+            read_options = pa_csv.ReadOptions(use_threads=True, block_size=4 << 20)
+            table = pa_csv.read_csv(
+                obj["Body"],
+                read_options=read_options,
+                convert_options=convert_options,
+            )
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+        except Exception as e:
+            raise RuntimeError(f"Error reading CSV from S3 with PyArrow: {str(e)}")
+
+    def read_csv_header(self, key: str, max_bytes: int = 65536) -> List[str]:
+        """Read just the header row of a CSV file in S3 with a ranged GET."""
+        try:
+            obj = self.s3_client.get_object(
+                Bucket=self.bucket_name, Key=key, Range=f"bytes=0-{max_bytes - 1}"
+            )
+            lines = obj["Body"].read().decode("utf-8-sig").splitlines()
+            return next(csv.reader(lines[:1]), [])
+        except Exception as e:
+            raise RuntimeError(f"Error reading CSV header from S3: {str(e)}")
+
+    def read_parquet_from_s3(self, key: str, **pandas_kwargs) -> pd.DataFrame:
+        """Read Parquet file from S3 into DataFrame."""
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return pd.read_parquet(io.BytesIO(obj["Body"].read()), **pandas_kwargs)
+        except Exception as e:
+            raise RuntimeError(f"Error reading Parquet from S3: {str(e)}")
+
+    def read_text_from_s3(self, key: str, missing_ok: bool = False) -> Optional[str]:
+        """Read a small UTF-8 text object from S3, or None if missing_ok and it does not exist."""
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return obj["Body"].read().decode("utf-8")
+        except ClientError as e:
+            if missing_ok and e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise RuntimeError(f"Error reading text from S3: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Error reading text from S3: {str(e)}")
+
     def download_csv_from_s3(
         self, key: str, local_path: str, **pandas_kwargs
     ) -> pd.DataFrame:
@@ -87,6 +169,32 @@ class S3Helper:
         except Exception as e:
             raise RuntimeError(f"Error uploading DataFrame to S3: {str(e)}")
 
+    def upload_parquet_to_s3(
+        self, df: pd.DataFrame, key: str, index: bool = False, **pandas_kwargs
+    ):
+        """Upload DataFrame as Parquet to S3."""
+        try:
+            parquet_buffer = io.BytesIO()
+            df.to_parquet(parquet_buffer, index=index, **pandas_kwargs)
+            self.s3_client.put_object(
+                Bucket=self.bucket_name, Key=key, Body=parquet_buffer.getvalue()
+            )
+        except Exception as e:
+            raise RuntimeError(f"Error uploading DataFrame as Parquet to S3: {str(e)}")
+
+    def upload_text_to_s3(self, text: str, key: str, **put_kwargs):
+        """Upload a string to S3 as a UTF-8 text object."""
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=text.encode("utf-8"),
+                ContentType="text/plain",
+                **put_kwargs,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Error uploading text to S3: {str(e)}")
+
     def upload_file_to_s3(self, local_path: str, key: str):
         """Upload local file to S3."""
         try:
@@ -0,0 +1,97 @@
+# dashboard/common.py
+"""Cached S3 loaders and chart helpers shared by the Streamlit dashboard pages."""
+
+from functools import lru_cache
+
+import pandas as pd
+import streamlit as st
+
+from aws.connect_to_s3 import S3Helper
+
+# Chart colours shared by every page so gains and losses read the same everywhere
+GAIN_COLOR = "mediumseagreen"
+LOSS_COLOR = "indianred"
+
+# Above this many rows line charts drop per-point markers, which dominate render cost on long histories
+POINT_MARKER_LIMIT = 1000
+
+# Raw tables show the most recent rows only, so the payload tracks what is visible rather than the full history
+TABLE_ROW_LIMIT = 500
+
+
+@lru_cache(maxsize=16)
+def snake_case(name):
+    """Converts a display name to the snake_case used in staging file names and widget keys."""
+    return name.lower().replace(" ", "_")
+
+
+@st.cache_resource
+def get_s3_helper():
+    """Creates the S3 helper once so its boto3 client is reused across reruns."""
+    return S3Helper()
+
+
+@st.cache_resource
+def get_environment():
+    """Reads the configured environment once."""
+    from configuration.secrets import ENVIRONMENT
+
+    return ENVIRONMENT
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def latest_key(_s3_helper, prefix):
+    """Returns the most recent staging key for a prefix, or None if none exist."""
+    return _s3_helper.latest_file(prefix=prefix)
+
+
+def refresh_button():
+    """Adds a sidebar button that makes the next lookup find newly written staging files."""
+    if st.sidebar.button("Refresh data"):
+        # Staging files are never overwritten, so only the latest-key lookup can go stale
+        latest_key.clear()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def read_staging(_s3_helper, key, timestamp_column):
+    """Loads a staging file. Files are immutable, so its S3 key is the cache identity here and in the pages' per-file caches."""
+    if key.endswith(".parquet"):
+        # Parquet keeps the datetime dtype, so no parsing is needed
+        df = _s3_helper.read_parquet_from_s3(key)
+    else:
+        df = _s3_helper.read_arrow_csv_from_s3(
+            key, timestamp_columns=[timestamp_column]
+        )
+
+    # Narrow the integer counts; money columns stay float64, as float32 loses
+    # pence from about £131k upwards and the metrics and tables need exact values
+    for col in df.select_dtypes("int64").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def chart_frame(df, columns):
+    """Projects the charted columns with floats downcast to float32 to halve the chart payload."""
+    plot_df = df[columns]
+    return plot_df.astype(
+        {col: "float32" for col in plot_df.select_dtypes("float64").columns}
+    )
+
+
+def data_less_spec(chart):
+    """Serialises a chart built without data into a spec for st.vega_lite_chart."""
+    spec = chart.to_dict()
+    # Drop Altair's placeholder dataset so the frame passed at render time is the chart source,
+    # and its default theme, which st.altair_chart never applied either
+    for key in ("datasets", "config"):
+        spec.pop(key, None)
+    _strip_data(spec)
+    return spec
+
+
+def _strip_data(view):
+    """Removes data references from a view and every layered or concatenated child."""
+    view.pop("data", None)
+    for key in ("layer", "vconcat", "hconcat", "concat"):
+        for child in view.get(key, []):
+            _strip_data(child)
@@ -1,17 +1,15 @@
 # pensions/cleansed/create_pensions_cleansed_tables.py
 import pandas as pd
+import pyarrow as pa
 import sys
-import os
 from datetime import datetime
 import re
 
-# Add project root to path to allow importing helpers
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
-
 from aws.connect_to_s3 import S3Helper
 
+# Raw columns kept as text for the cleaning step: day-first dates and £-formatted values
+RAW_COLUMN_TYPES = {"Timestamp": pa.string(), "Value": pa.string()}
+
 
 class PensionsDataCleaner:
     """Cleans and transforms raw pensions data from S3."""
@@ -69,6 +67,9 @@ class PensionsDataCleaner:
         ]
 
         # Clean data types
+        snapshots_df["platform"] = pd.Categorical(
+            snapshots_df["platform"], categories=self.pension_platforms
+        )
         snapshots_df["value"] = self.clean_value_column(snapshots_df["value"])
         snapshots_df["timestamp"] = pd.to_datetime(
             snapshots_df["timestamp"], dayfirst=True
@@ -92,6 +93,9 @@ class PensionsDataCleaner:
         ]
 
         # Clean data types
+        cashflows_df["platform"] = pd.Categorical(
+            cashflows_df["platform"], categories=self.pension_platforms
+        )
         cashflows_df["value"] = self.clean_value_column(cashflows_df["value"])
         cashflows_df["timestamp"] = pd.to_datetime(
             cashflows_df["timestamp"], dayfirst=True
@@ -107,14 +111,22 @@ class PensionsDataCleaner:
         """Uploads the cleansed dataframes to the 'cleansed' layer in S3."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        snapshots_key = f"{base_s3_path}/pensions_snapshots_cleansed_{timestamp}.csv"
-        cashflows_key = f"{base_s3_path}/pensions_cashflows_cleansed_{timestamp}.csv"
+        snapshots_key = (
+            f"{base_s3_path}/pensions_snapshots_cleansed_{timestamp}.parquet"
+        )
+        cashflows_key = (
+            f"{base_s3_path}/pensions_cashflows_cleansed_{timestamp}.parquet"
+        )
 
         print(f"Uploading cleansed snapshots to: {snapshots_key}")
-        self.s3_helper.upload_csv_to_s3(snapshots_df, snapshots_key, index=False)
+        self.s3_helper.upload_parquet_to_s3(
+            snapshots_df, snapshots_key, index=False, compression="zstd"
+        )
 
         print(f"Uploading cleansed cashflows to: {cashflows_key}")
-        self.s3_helper.upload_csv_to_s3(cashflows_df, cashflows_key, index=False)
+        self.s3_helper.upload_parquet_to_s3(
+            cashflows_df, cashflows_key, index=False, compression="zstd"
+        )
 
 
 def main():
@@ -134,8 +146,12 @@ def main():
         snapshots_key, cashflows_key = cleaner.find_latest_raw_files(raw_base_path)
 
         # 2. Load raw data
-        snapshots_df = cleaner.s3_helper.read_csv_from_s3(snapshots_key)
-        cashflows_df = cleaner.s3_helper.read_csv_from_s3(cashflows_key)
+        snapshots_df = cleaner.s3_helper.read_arrow_csv_from_s3(
+            snapshots_key, column_types=RAW_COLUMN_TYPES
+        )
+        cashflows_df = cleaner.s3_helper.read_arrow_csv_from_s3(
+            cashflows_key, column_types=RAW_COLUMN_TYPES
+        )
 
         # 3. Clean and transform data
         cleansed_snapshots_df, cleansed_cashflows_df = cleaner.clean_dataframes(
@@ -1,13 +1,7 @@
 # pensions/raw/create_pensions_raw_tables.py
 import sys
-import os
 from datetime import datetime
 
-# Add project root to path to allow importing helpers
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
-
 from gcp.google_sheets_helper import GoogleSheetsHelper
 from aws.connect_to_s3 import S3Helper
 
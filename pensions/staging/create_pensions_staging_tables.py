@@ -1,16 +1,13 @@
 # pensions/staging/create_pensions_staging_tables.py
 import pandas as pd
 import sys
-import os
 from datetime import datetime
 
-# Add project root to path to allow importing helpers
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
-
 from aws.connect_to_s3 import S3Helper
 
+# Cleansed columns used to build the performance timeseries
+CLEANSED_COLUMNS = ["platform", "timestamp", "value"]
+
 
 class PensionsStagingCreator:
     """Creates pension performance staging tables from cleansed data."""
@@ -47,23 +44,38 @@ class PensionsStagingCreator:
 
         return latest_snapshots_key, latest_cashflows_key
 
+    def read_cleansed_file(self, key: str) -> pd.DataFrame:
+        """Reads the columns needed for staging from a cleansed Parquet or CSV file."""
+        if key.endswith(".parquet"):
+            return self.s3_helper.read_parquet_from_s3(key, columns=CLEANSED_COLUMNS)
+        return self.s3_helper.read_csv_from_s3(
+            key,
+            usecols=CLEANSED_COLUMNS,
+            parse_dates=["timestamp"],
+            dtype={"platform": "category"},
+        )
+
     def calculate_performance_timeseries(
         self, snapshots_df: pd.DataFrame, cashflows_df: pd.DataFrame
     ):
         """Calculates a detailed, event-driven gain/loss timeseries for each pension."""
         all_performance_data = {}
 
+        # Split each table by platform in one pass instead of masking it per platform
+        cashflows_by_platform = dict(
+            tuple(cashflows_df.groupby("platform", sort=False, observed=True))
+        )
+        snapshots_by_platform = dict(
+            tuple(snapshots_df.groupby("platform", sort=False, observed=True))
+        )
+
         for platform in self.pension_platforms:
             print(f"\n--- Processing performance for {platform} ---")
 
-            platform_cashflows = cashflows_df[
-                cashflows_df["platform"] == platform
-            ].copy()
-            platform_snapshots = snapshots_df[
-                snapshots_df["platform"] == platform
-            ].copy()
+            platform_cashflows = cashflows_by_platform.get(platform)
+            platform_snapshots = snapshots_by_platform.get(platform)
 
-            if platform_cashflows.empty or platform_snapshots.empty:
+            if platform_cashflows is None or platform_snapshots is None:
                 print(f"Not enough data for {platform}. Skipping.")
                 continue
 
@@ -151,12 +163,10 @@ class PensionsStagingCreator:
 
         for platform, df in performance_data.items():
             platform_name_snake_case = platform.lower().replace(" ", "_")
-            staging_key = (
-                f"{base_s3_path}/timeseries_{platform_name_snake_case}_{timestamp}.csv"
-            )
+            staging_key = f"{base_s3_path}/timeseries_{platform_name_snake_case}_{timestamp}.parquet"
 
             print(f"Uploading {platform} staging data to: {staging_key}")
-            self.s3_helper.upload_csv_to_s3(df, staging_key, index=False)
+            self.s3_helper.upload_parquet_to_s3(df, staging_key, index=False)
 
 
 def main():
@@ -176,12 +186,8 @@ def main():
         )
 
         # 2. Load cleansed data
-        snapshots_df = staging_creator.s3_helper.read_csv_from_s3(
-            snapshots_key, parse_dates=["timestamp"]
-        )
-        cashflows_df = staging_creator.s3_helper.read_csv_from_s3(
-            cashflows_key, parse_dates=["timestamp"]
-        )
+        snapshots_df = staging_creator.read_cleansed_file(snapshots_key)
+        cashflows_df = staging_creator.read_cleansed_file(cashflows_key)
 
         # 3. Calculate performance
         performance_data = staging_creator.calculate_performance_timeseries(
@@ -1,14 +1,14 @@
 # streamlit/pages/1_Pensions.py
 import streamlit as st
-import pandas as pd
 import altair as alt
-import sys
-import os
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# Add parent directory to path to import S3Helper
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from aws.connect_to_s3 import S3Helper
+from dashboard.common import (
+    GAIN_COLOR, LOSS_COLOR, POINT_MARKER_LIMIT, TABLE_ROW_LIMIT,
+    chart_frame, data_less_spec, get_environment, get_s3_helper, latest_key, read_staging,
+    refresh_button, snake_case,
+)
 
 st.set_page_config(
     page_title="Pensions Dashboard",
@@ -16,35 +16,80 @@ st.set_page_config(
     layout="wide",
 )
 
-@st.cache_data(ttl=600)
-def load_latest_pension_data(_s3_helper, base_path, platform_name):
-    """Loads the most recent pension timeseries file for a given platform."""
+# Platforms with a staging time series, in tab order
+PLATFORMS = ["Wahed", "Standard Life"]
+
+PLATFORM_HEADERS = {
+    "Wahed": "Wahed SIPP Performance",
+    "Standard Life": "Standard Life Pension Performance",
+}
+
+# Line colours for the performance chart
+PENSION_VALUE_COLOR = 'skyblue'
+CASH_INVESTED_COLOR = 'orange'
+
+# Columns referenced by the performance and gain/loss charts
+CHART_COLUMNS = [
+    'timestamp', 'cash_invested', 'pension_value', 'imputed_pension_value',
+    'gain_loss_absolute', 'gain_loss_percentage',
+]
+
+# Display formats for the staging table, applied in the browser rather than by building strings in pandas
+STAGING_TABLE_CONFIG = {
+    'timestamp': st.column_config.DateColumn(format='YYYY-MM-DD'),
+    **{
+        col: st.column_config.NumberColumn(format='£%.2f')
+        for col in ['cash_invested', 'pension_value', 'imputed_pension_value', 'gain_loss_absolute', 'imputed_gain_loss_absolute']
+    },
+    **{
+        col: st.column_config.NumberColumn(format='%.2f%%')
+        for col in ['gain_loss_percentage', 'imputed_gain_loss_percentage']
+    },
+}
+
+def fetch_latest_pension_data(s3_helper, base_path, platform_name):
+    """Fetches the latest staging key and data for a platform. Makes no UI calls so it can run in a worker thread."""
+    file_prefix = f"{base_path}/staging/timeseries_{snake_case(platform_name)}_"
+    
+    latest_file = latest_key(s3_helper, file_prefix)
+    if latest_file is None:
+        return None, None
+    return latest_file, read_staging(s3_helper, latest_file, 'timestamp')
+
+def load_latest_pension_data(future, platform_name):
+    """Reports the outcome of a pension data fetch and returns the staging key and loaded data."""
     try:
-        platform_name_snake_case = platform_name.lower().replace(' ', '_')
-        file_prefix = f"{base_path}/staging/timeseries_{platform_name_snake_case}_"
-        
-        files = _s3_helper.list_files(prefix=file_prefix)
-        if not files:
-            st.warning(f"No staging data found for '{platform_name}'. Please run the pensions pipeline.")
-            return None
-        
-        latest_file = sorted(files)[-1]
-        st.info(f"Loading {platform_name} data from: `{latest_file}`")
-        df = _s3_helper.read_csv_from_s3(latest_file)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
+        latest_file, df = future.result()
     except Exception as e:
         st.error(f"Failed to load data for {platform_name}: {e}")
-        return None
+        return None, None
+    
+    if latest_file is None:
+        st.warning(f"No staging data found for '{platform_name}'. Please run the pensions pipeline.")
+        return None, None
+    
+    st.info(f"Loading {platform_name} data from: `{latest_file}`")
+    return latest_file, df
+
+@st.cache_data
+def _latest_metrics(key, _df):
+    """Formats the headline metrics from the last row once per staging file."""
+    last_idx = len(_df) - 1
+    return {
+        'pension_value': f"£{_df['pension_value'].iat[last_idx]:,.2f}",
+        'cash_invested': f"£{_df['cash_invested'].iat[last_idx]:,.2f}",
+        'gain_loss_absolute': f"£{_df['gain_loss_absolute'].iat[last_idx]:,.2f}",
+        'gain_loss_percentage': f"{_df['gain_loss_percentage'].iat[last_idx]:.2f}%",
+    }
 
-def create_performance_chart(df, platform_name):
+def create_performance_chart(platform_name, show_points=True):
     """Creates a chart comparing pension value vs. cash invested."""
     
-    base = alt.Chart(df).encode(
+    base = alt.Chart().encode(
         x=alt.X('timestamp:T', title='Date')
     )
     
-    pension_value_line = base.mark_line(color='skyblue', point=True).encode(
+    pension_value_line = base.mark_line(color=PENSION_VALUE_COLOR, point=show_points).encode(
         y=alt.Y('imputed_pension_value:Q', title='Value (£)', scale=alt.Scale(zero=False)),
         tooltip=[
             alt.Tooltip('timestamp:T', title='Date'),
@@ -53,7 +98,7 @@ def create_performance_chart(df, platform_name):
         ]
     )
     
-    cash_invested_line = base.mark_line(color='orange', point=True, interpolate='step-after').encode(
+    cash_invested_line = base.mark_line(color=CASH_INVESTED_COLOR, point=show_points, interpolate='step-after').encode(
         y=alt.Y('cash_invested:Q', title='Value (£)'),
         tooltip=[
             alt.Tooltip('timestamp:T', title='Date'),
@@ -66,16 +111,16 @@ def create_performance_chart(df, platform_name):
         title=f"{platform_name}: Pension Value vs. Cash Invested"
     )
 
-def create_gain_loss_chart(df, platform_name):
+def create_gain_loss_chart(platform_name):
     """Creates a bar chart showing absolute gain/loss over time."""
     
-    chart = alt.Chart(df).mark_bar().encode(
+    chart = alt.Chart().mark_bar().encode(
         x=alt.X('timestamp:T', title='Date'),
         y=alt.Y('gain_loss_absolute:Q', title='Gain / Loss (£)'),
         color=alt.condition(
             alt.datum.gain_loss_absolute > 0,
-            alt.value("mediumseagreen"),
-            alt.value("indianred")
+            alt.value(GAIN_COLOR),
+            alt.value(LOSS_COLOR)
         ),
         tooltip=[
             alt.Tooltip('timestamp:T', title='Date'),
@@ -87,70 +132,75 @@ def create_gain_loss_chart(df, platform_name):
     )
     return chart
 
+@st.cache_data
+def get_pension_chart_spec(platform_name, show_points=True):
+    """Builds the stacked chart spec once per platform; only the data changes between reruns."""
+    return data_less_spec(alt.vconcat(
+        create_performance_chart(platform_name, show_points),
+        create_gain_loss_chart(platform_name),
+    ))
+
+def render_platform(platform_name, key, df):
+    """Renders the metrics, charts and staging table for one platform."""
+    st.header(PLATFORM_HEADERS[platform_name])
+    if df is None:
+        st.info(f"No data available for {platform_name}.")
+        return
+    
+    # Key Metrics
+    metrics = _latest_metrics(key, df)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Latest Pension Value", metrics['pension_value'])
+    col2.metric("Total Cash Invested", metrics['cash_invested'])
+    col3.metric("Overall Gain / Loss", metrics['gain_loss_absolute'], metrics['gain_loss_percentage'])
+    
+    # Charts
+    st.vega_lite_chart(chart_frame(df, CHART_COLUMNS), get_pension_chart_spec(platform_name, len(df) <= POINT_MARKER_LIMIT), use_container_width=True)
+    
+    # Data Table
+    with st.expander("View Raw Staging Data"):
+        table_df = df
+        if len(df) > TABLE_ROW_LIMIT:
+            rows = st.slider("Rows to show", 100, len(df), TABLE_ROW_LIMIT, key=f"rows_{snake_case(platform_name)}")
+            table_df = df.tail(rows)
+        st.dataframe(table_df, column_config=STAGING_TABLE_CONFIG)
+
 def main():
     """Main Streamlit application for the Pensions Dashboard."""
     st.title("💰 Pensions Performance Dashboard")
     st.markdown("An overview of your pension performance based on cashflows and snapshots.")
 
     try:
-        from configuration.secrets import ENVIRONMENT
+        environment = get_environment()
     except ImportError:
         st.error("Secrets file not found. Please ensure `configuration/secrets.py` is set up.")
         st.stop()
     
-    s3_helper = S3Helper()
-    base_path = f"{ENVIRONMENT}/pensions"
+    refresh_button()
+    
+    s3_helper = get_s3_helper()
+    base_path = f"{environment}/pensions"
     
     # --- Load Data for Both Platforms ---
-    wahed_df = load_latest_pension_data(s3_helper, base_path, "Wahed")
-    sl_df = load_latest_pension_data(s3_helper, base_path, "Standard Life")
+    # The S3 round-trips are independent, so overlap them in worker threads.
+    # Workers share the script context so cached helpers resolve the session's cache.
+    ctx = get_script_run_ctx()
+    with st.spinner("Loading data..."), ThreadPoolExecutor(max_workers=len(PLATFORMS), initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        futures = {
+            platform: executor.submit(fetch_latest_pension_data, s3_helper, base_path, platform)
+            for platform in PLATFORMS
+        }
+    
+    frames = {platform: load_latest_pension_data(future, platform) for platform, future in futures.items()}
 
-    if wahed_df is None and sl_df is None:
+    if all(df is None for _, df in frames.values()):
         st.warning("No pension data could be loaded. Please run the pipeline.")
         st.stop()
         
-    # --- Create Tabs for Each Pension ---
-    tab1, tab2 = st.tabs(["Wahed", "Standard Life"])
-
-    with tab1:
-        st.header("Wahed SIPP Performance")
-        if wahed_df is not None:
-            # Key Metrics
-            latest_wahed = wahed_df.iloc[-1]
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Latest Pension Value", f"£{latest_wahed['pension_value']:,.2f}")
-            col2.metric("Total Cash Invested", f"£{latest_wahed['cash_invested']:,.2f}")
-            col3.metric("Overall Gain / Loss", f"£{latest_wahed['gain_loss_absolute']:,.2f}", f"{latest_wahed['gain_loss_percentage']:.2f}%")
-
-            # Charts
-            st.altair_chart(create_performance_chart(wahed_df, "Wahed"), use_container_width=True)
-            st.altair_chart(create_gain_loss_chart(wahed_df, "Wahed"), use_container_width=True)
-            
-            # Data Table
-            with st.expander("View Raw Staging Data"):
-                st.dataframe(wahed_df)
-        else:
-            st.info("No data available for Wahed.")
-
-    with tab2:
-        st.header("Standard Life Pension Performance")
-        if sl_df is not None:
-            # Key Metrics
-            latest_sl = sl_df.iloc[-1]
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Latest Pension Value", f"£{latest_sl['pension_value']:,.2f}")
-            col2.metric("Total Cash Invested", f"£{latest_sl['cash_invested']:,.2f}")
-            col3.metric("Overall Gain / Loss", f"£{latest_sl['gain_loss_absolute']:,.2f}", f"{latest_sl['gain_loss_percentage']:.2f}%")
-            
-            # Charts
-            st.altair_chart(create_performance_chart(sl_df, "Standard Life"), use_container_width=True)
-            st.altair_chart(create_gain_loss_chart(sl_df, "Standard Life"), use_container_width=True)
-            
-            # Data Table
-            with st.expander("View Raw Staging Data"):
-                st.dataframe(sl_df)
-        else:
-            st.info("No data available for Standard Life.")
+    # --- Show One Pension at a Time ---
+    # Unlike st.tabs, only the selected platform's body runs on each rerun
+    platform = st.radio("Platform", PLATFORMS, horizontal=True, label_visibility="collapsed")
+    render_platform(platform, *frames[platform])
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,14 +1,13 @@
 # streamlit/pages/2_Wise.py
 import streamlit as st
-import pandas as pd
+import numpy as np
 import altair as alt
-import sys
-import os
 
-# Add parent directory to path to import S3Helper
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from aws.connect_to_s3 import S3Helper
+from dashboard.common import (
+    GAIN_COLOR, LOSS_COLOR, POINT_MARKER_LIMIT, TABLE_ROW_LIMIT,
+    chart_frame, data_less_spec, get_environment, get_s3_helper, latest_key, read_staging,
+    refresh_button,
+)
 
 st.set_page_config(
     page_title="Wise Dashboard",
@@ -16,33 +15,45 @@ st.set_page_config(
     layout="wide",
 )
 
-@st.cache_data(ttl=600)
-def load_latest_staging_data(_s3_helper, base_path, file_prefix):
-    """Loads the most recent staging file."""
+# Colours for the balance line and the cash flow heatmap
+BALANCE_COLOR = 'steelblue'
+HEATMAP_SCHEME = 'redblue'
+
+# Columns referenced by the charts and heatmap
+CHART_COLUMNS = ['date', 'net_change', 'closing_balance']
+
+# Display formats for the daily table, applied in the browser rather than by building strings in pandas
+DAILY_TABLE_CONFIG = {
+    'date': st.column_config.DateColumn(format='YYYY-MM-DD'),
+    **{
+        col: st.column_config.NumberColumn(format='£%.2f')
+        for col in ['opening_balance', 'closing_balance', 'net_change', 'deposits', 'withdrawals', 'fees']
+    },
+}
+
+def load_latest_staging_data(s3_helper, base_path, file_prefix):
+    """Loads the most recent staging file, returning its S3 key alongside the data."""
     try:
-        files = _s3_helper.list_files(prefix=f"{base_path}/staging/{file_prefix}")
-        if not files:
+        latest_file = latest_key(s3_helper, f"{base_path}/staging/{file_prefix}")
+        if latest_file is None:
             st.warning(f"No staging data found with prefix '{file_prefix}'. Please run the Wise pipeline.")
-            return None
+            return None, None
         
-        latest_file = sorted(files)[-1]
         st.info(f"Loading data from: `{latest_file}`")
-        df = _s3_helper.read_csv_from_s3(latest_file)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
+        return latest_file, read_staging(s3_helper, latest_file, 'date')
     except Exception as e:
         st.error(f"Failed to load data: {e}")
-        return None
+        return None, None
 
-def create_net_change_chart(df):
+def create_net_change_chart():
     """Creates a bar chart of daily net change."""
-    chart = alt.Chart(df).mark_bar().encode(
+    chart = alt.Chart().mark_bar().encode(
         x=alt.X('date:T', title='Date'),
         y=alt.Y('net_change:Q', title='Net Change (£)'),
         color=alt.condition(
             alt.datum.net_change > 0,
-            alt.value("mediumseagreen"),
-            alt.value("indianred")
+            alt.value(GAIN_COLOR),
+            alt.value(LOSS_COLOR)
         ),
         tooltip=[
             alt.Tooltip('date:T', title='Date'),
@@ -56,9 +67,9 @@ def create_net_change_chart(df):
     )
     return chart
 
-def create_balance_chart(df):
+def create_balance_chart(show_points=True):
     """Creates a line chart of daily closing balance."""
-    chart = alt.Chart(df).mark_line(point=True, color='steelblue').encode(
+    chart = alt.Chart().mark_line(point=show_points, color=BALANCE_COLOR).encode(
         x=alt.X('date:T', title='Date'),
         y=alt.Y('closing_balance:Q', title='Balance (£)', scale=alt.Scale(zero=False)),
         tooltip=[
@@ -73,20 +84,48 @@ def create_balance_chart(df):
     )
     return chart
 
-def create_calendar_heatmap(df):
+@st.cache_data
+def _summary_stats(key, _df):
+    """Computes and formats the headline metrics once per staging file."""
+    return {
+        'latest_balance': f"£{_df['closing_balance'].iat[-1]:,.2f}",
+        'total_deposits': f"£{_df['deposits'].to_numpy().sum():,.2f}",
+        'total_withdrawals': f"£{_df['withdrawals'].to_numpy().sum():,.2f}",
+        'total_fees': f"£{_df['fees'].to_numpy().sum():,.2f}",
+    }
+
+@st.cache_data
+def get_balance_chart_specs(show_points=True):
+    """Builds the net change and balance chart specs once; only the data changes between reruns."""
+    return [data_less_spec(create_net_change_chart()), data_less_spec(create_balance_chart(show_points))]
+
+@st.cache_data(ttl=3600, max_entries=4)
+def _heatmap_frame(key, _df):
+    """Adds heatmap cell coordinates to the daily data and computes its colour bound."""
+    # Staging holds one row per date, so each row is already one calendar cell
+    dates = _df['date']
+    df_heatmap = _df.assign(
+        day=dates.dt.day.astype('int8'),
+        # YYYYMM as an integer; the axis formats it back to YYYY-MM
+        month=(dates.dt.year * 100 + dates.dt.month).astype('int32'),
+    )
+    # Reduce on the raw array rather than building an intermediate abs() Series
+    max_abs = float(np.abs(df_heatmap['net_change'].to_numpy()).max())
+    return df_heatmap, max_abs
+
+def create_calendar_heatmap(max_abs):
     """Creates a calendar heatmap for cash flow analysis."""
-    df_heatmap = df.copy()
-    df_heatmap['day'] = df_heatmap['date'].dt.day
-    df_heatmap['month'] = df_heatmap['date'].dt.strftime('%Y-%m')
-    df_heatmap['weekday'] = df_heatmap['date'].dt.day_name()
-    
-    chart = alt.Chart(df_heatmap).mark_rect().encode(
+    chart = alt.Chart().mark_rect().encode(
         x=alt.X('day:O', title='Day of Month'),
-        y=alt.Y('month:O', title='Month'),
+        y=alt.Y(
+            'month:O',
+            title='Month',
+            axis=alt.Axis(labelExpr="floor(datum.value / 100) + '-' + (datum.value % 100 < 10 ? '0' : '') + datum.value % 100"),
+        ),
         color=alt.Color(
             'net_change:Q',
             title='Net Change (£)',
-            scale=alt.Scale(scheme='redblue', domain=[-df_heatmap['net_change'].abs().max(), df_heatmap['net_change'].abs().max()])
+            scale=alt.Scale(scheme=HEATMAP_SCHEME, domain=[-max_abs, max_abs])
         ),
         tooltip=[
             alt.Tooltip('date:T', title='Date'),
@@ -100,22 +139,30 @@ def create_calendar_heatmap(df):
     )
     return chart
 
+@st.cache_data
+def get_heatmap_spec(max_abs):
+    """Builds the heatmap spec once per colour bound, so its cache key is a float rather than the data."""
+    return data_less_spec(create_calendar_heatmap(max_abs))
+
 def main():
     """Main Streamlit application for the Wise Dashboard."""
     st.title("💳 Wise Banking Dashboard")
     st.markdown("An overview of your Wise account balance and transaction patterns.")
 
     try:
-        from configuration.secrets import ENVIRONMENT
+        environment = get_environment()
     except ImportError:
         st.error("Secrets file not found. Please ensure `configuration/secrets.py` is set up.")
         st.stop()
     
-    s3_helper = S3Helper()
-    base_path = f"{ENVIRONMENT}/bank-statements/wise-gbp"
+    refresh_button()
+    
+    s3_helper = get_s3_helper()
+    base_path = f"{environment}/bank-statements/wise-gbp"
     
     # Load daily data
-    daily_df = load_latest_staging_data(s3_helper, base_path, "wise_balance_daily_")
+    with st.spinner("Loading data..."):
+        daily_key, daily_df = load_latest_staging_data(s3_helper, base_path, "wise_balance_daily_")
     
     if daily_df is None:
         st.warning("No data could be loaded. Please run the Wise pipeline.")
@@ -123,36 +170,42 @@ def main():
 
     # Key Metrics
     st.header("Key Metrics")
-    latest_balance = daily_df['closing_balance'].iloc[-1]
-    total_deposits = daily_df['deposits'].sum()
-    total_withdrawals = daily_df['withdrawals'].sum()
-    total_fees = daily_df['fees'].sum()
+    stats = _summary_stats(daily_key, daily_df)
     
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Current Balance", f"£{latest_balance:,.2f}")
-    col2.metric("Total Deposits", f"£{total_deposits:,.2f}")
-    col3.metric("Total Withdrawals", f"£{total_withdrawals:,.2f}")
-    col4.metric("Total Fees", f"£{total_fees:,.2f}")
+    col1.metric("Current Balance", stats['latest_balance'])
+    col2.metric("Total Deposits", stats['total_deposits'])
+    col3.metric("Total Withdrawals", stats['total_withdrawals'])
+    col4.metric("Total Fees", stats['total_fees'])
+
+    # Keep only the charted columns, rounded to pence, to shrink the payload sent to the browser
+    plot_df = chart_frame(daily_df, CHART_COLUMNS).round({'net_change': 2, 'closing_balance': 2})
 
     # Charts
     st.header("Balance Analysis")
+    net_change_spec, balance_spec = get_balance_chart_specs(len(plot_df) <= POINT_MARKER_LIMIT)
     col1, col2 = st.columns(2)
     
     with col1:
-        st.altair_chart(create_net_change_chart(daily_df), use_container_width=True)
+        st.vega_lite_chart(plot_df, net_change_spec, use_container_width=True)
     
     with col2:
-        st.altair_chart(create_balance_chart(daily_df), use_container_width=True)
+        st.vega_lite_chart(plot_df, balance_spec, use_container_width=True)
 
     # Cash Flow Analysis
     st.header("Cash Flow Analysis")
-    st.altair_chart(create_calendar_heatmap(daily_df), use_container_width=True)
+    df_heatmap, max_abs = _heatmap_frame(daily_key, plot_df)
+    st.vega_lite_chart(df_heatmap, get_heatmap_spec(max_abs), use_container_width=True)
 
     # Data Tables
     st.header("Data Tables")
     
     with st.expander("View Daily Balance Data"):
-        st.dataframe(daily_df)
+        table_df = daily_df
+        if len(daily_df) > TABLE_ROW_LIMIT:
+            rows = st.slider("Rows to show", 100, len(daily_df), TABLE_ROW_LIMIT)
+            table_df = daily_df.tail(rows)
+        st.dataframe(table_df, column_config=DAILY_TABLE_CONFIG)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,32 +4,85 @@ Create cleansed Wise transaction tables from raw statement CSV.
 Transforms raw 30-column statement into analysis-ready format.
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import re
 from datetime import datetime
 from typing import List, Dict, Optional
 import sys
-import os
-
-# Add parent directory to path for S3 connector
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
 
 from aws.connect_to_s3 import S3Helper
 
+# Manifest in the cleansed folder holding the key of the newest cleansed file
+LATEST_MANIFEST = "_latest.txt"
+
+# The only raw statement columns the pipeline uses, out of about 30
+RAW_COLUMNS = [
+    "Date Time",
+    "Amount",
+    "Currency",
+    "Description",
+    "Running Balance",
+]
+
+# Raw columns read as text; amounts are left to inference and coerced in transform_data
+RAW_COLUMN_TYPES = {
+    "Date Time": pa.string(),
+    "Currency": pa.string(),
+    "Description": pa.string(),
+}
+
+
+# Descriptions that must match exactly
+EXACT_DESCRIPTIONS = {
+    # GBP Assets service fee - fee charged for open balance
+    "GBP Assets service fee": "fee",
+}
+
+# Description prefixes, matched at the start of the stripped description
+DESCRIPTION_PREFIXES = {
+    # Received money - transfer in
+    "Received money": "transfer_in",
+    # Sent money - transfer out
+    "Sent money": "transfer_out",
+    # Card transaction - transfer out
+    "Card transaction": "card",
+    # Wise Charges for - fee for a transaction
+    "Wise Charges for": "fee",
+}
+
+DESCRIPTION_LABELS = {**EXACT_DESCRIPTIONS, **DESCRIPTION_PREFIXES}
+
+# All rules as one anchored alternation, compiled once at import
+DESCRIPTION_PATTERN = re.compile(
+    "^("
+    + "|".join(
+        [f"{re.escape(text)}$" for text in EXACT_DESCRIPTIONS]
+        + [re.escape(prefix) for prefix in DESCRIPTION_PREFIXES]
+    )
+    + ")"
+)
+
 
 class WiseDataCleaner:
     """Clean and transform Wise statement data."""
 
-    def __init__(self):
-        self.s3 = S3Helper()
+    def __init__(self, s3: Optional[S3Helper] = None):
+        self.s3 = s3 or S3Helper()
 
     def load_raw_data(self, file_key: str) -> pd.DataFrame:
         """Load raw Wise statement from S3."""
         try:
             print(f"Loading raw data from: {file_key}")
-            df = self.s3.read_csv_from_s3(file_key)
+            # Parse only the used columns the file has, so validate_raw_data can
+            # still name any that are missing
+            header = self.s3.read_csv_header(file_key)
+            df = self.s3.read_arrow_csv_from_s3(
+                file_key,
+                column_types=RAW_COLUMN_TYPES,
+                columns=[col for col in RAW_COLUMNS if col in header],
+            )
             print(f"Loaded {len(df)} transactions")
             return df
         except Exception as e:
@@ -37,47 +90,28 @@ class WiseDataCleaner:
 
     def validate_raw_data(self, df: pd.DataFrame) -> bool:
         """Validate required columns exist in raw data."""
-        required_columns = [
-            "Date Time",
-            "Amount",
-            "Currency",
-            "Description",
-            "Running Balance",
-        ]
-
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in RAW_COLUMNS if col not in df.columns]
         if missing_columns:
             raise ValueError(f"Missing required columns: {missing_columns}")
 
         print("Raw data validation passed")
         return True
 
-    def categorize_transaction(self, row: pd.Series) -> str:
-        """Categorize transaction based on description only."""
-        description = str(row.get("Description", "")).strip()
-
-        # GBP Assets service fee - fee charged for open balance
-        if description == "GBP Assets service fee":
-            return "fee"
+    def categorize_transactions(self, descriptions: pd.Series) -> pd.Categorical:
+        """Categorize transactions based on description only."""
+        # Classify each distinct description once; rows pick up their label by category code
+        descriptions = descriptions.astype("category")
+        description = descriptions.cat.categories.to_series().astype(str).str.strip()
 
-        # Received money - transfer in
-        if description.startswith("Received money"):
-            return "transfer_in"
+        # Match every rule in one pass with the precompiled anchored alternation
+        matched = description.str.extract(DESCRIPTION_PATTERN, expand=False)
 
-        # Sent money - transfer out
-        if description.startswith("Sent money"):
-            return "transfer_out"
-
-        # Card transaction - transfer out
-        if description.startswith("Card transaction"):
-            return "card"
-
-        # Wise Charges for - fee for a transaction
-        if description.startswith("Wise Charges for"):
-            return "fee"
-
-        # Default category
-        return "other"
+        # Default category, with a trailing entry for missing descriptions (code -1)
+        labels = np.append(
+            matched.map(DESCRIPTION_LABELS).fillna("other").to_numpy(dtype=object),
+            "other",
+        )
+        return pd.Categorical(labels[descriptions.cat.codes.to_numpy()])
 
     def transform_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Transform raw data into cleansed format."""
@@ -94,21 +128,25 @@ class WiseDataCleaner:
         cleansed["running_balance"] = pd.to_numeric(
             df["Running Balance"], errors="coerce"
         )
-        cleansed["currency"] = df["Currency"]
+        cleansed["currency"] = df["Currency"].astype("category")
 
-        # Categorize transactions
-        cleansed["transaction_type"] = df.apply(self.categorize_transaction, axis=1)
+        # Original description, dictionary-encoded as it repeats heavily
+        description = df["Description"].astype("category")
 
-        # Original description
-        cleansed["description"] = df["Description"]
-
-        # Sort by datetime
-        cleansed = cleansed.sort_values(["datetime"])
+        # Categorize transactions
+        cleansed["transaction_type"] = self.categorize_transactions(description)
+        cleansed["description"] = description
 
-        # Remove duplicates based on datetime, amount, and description
-        cleansed = cleansed.drop_duplicates(
-            subset=["datetime", "amount", "description"]
+        # Remove duplicates based on datetime, amount, and description, keying
+        # the description by its integer category code rather than hashing each string
+        dedup_key = cleansed[["datetime", "amount"]].assign(
+            description=cleansed["description"].cat.codes
         )
+        cleansed = cleansed[~dedup_key.duplicated()]
+
+        # Sort the deduplicated rows by datetime with one stable argsort + take
+        order = cleansed["datetime"].to_numpy().argsort(kind="stable")
+        cleansed = cleansed.take(order)
 
         print(f"Transformed {len(cleansed)} transactions")
         return cleansed
@@ -117,27 +155,27 @@ class WiseDataCleaner:
         """Validate cleansed data quality."""
         print("Validating cleansed data...")
 
-        # Check for required fields
+        # Check for required fields, counting nulls in one pass over the frame
         required_fields = ["datetime", "amount", "running_balance"]
+        null_counts = df[required_fields].isna().sum()
         for field in required_fields:
-            if df[field].isnull().any():
+            if null_counts[field]:
                 print(f"Warning: Missing values in {field}")
 
         # Check for valid dates
-        invalid_dates = df[df["datetime"].isnull()]
-        if len(invalid_dates) > 0:
-            print(f"Warning: {len(invalid_dates)} transactions with invalid dates")
+        invalid_dates = int(null_counts["datetime"])
+        if invalid_dates:
+            print(f"Warning: {invalid_dates} transactions with invalid dates")
 
         # Check for valid amounts
-        invalid_amounts = df[df["amount"].isnull()]
-        if len(invalid_amounts) > 0:
-            print(f"Warning: {len(invalid_amounts)} transactions with invalid amounts")
+        invalid_amounts = int(null_counts["amount"])
+        if invalid_amounts:
+            print(f"Warning: {invalid_amounts} transactions with invalid amounts")
 
         # Check transaction type distribution
         type_counts = df["transaction_type"].value_counts()
         print("Transaction type distribution:")
-        for ttype, count in type_counts.items():
-            print(f"  {ttype}: {count}")
+        print(type_counts.rename_axis(None).to_string())
 
         print("Cleansed data validation completed")
         return True
@@ -146,13 +184,19 @@ class WiseDataCleaner:
         """Save cleansed data to S3."""
         try:
             print(f"Saving cleansed data to: {output_key}")
-            self.s3.upload_csv_to_s3(df, output_key, index=False)
+            self.s3.upload_parquet_to_s3(
+                df, output_key, index=False, compression="snappy"
+            )
             print("Cleansed data saved successfully")
+
+            # Point the manifest at the new file so staging can skip listing
+            manifest_key = f"{output_key.rsplit('/', 1)[0]}/{LATEST_MANIFEST}"
+            self.s3.upload_text_to_s3(output_key, manifest_key, CacheControl="no-cache")
         except Exception as e:
             raise RuntimeError(f"Failed to save cleansed data: {str(e)}")
 
-    def process_wise_statement(self, input_key: str, output_key: str):
-        """Main processing pipeline."""
+    def process_wise_statement(self, input_key: str, output_key: str) -> pd.DataFrame:
+        """Main processing pipeline. Returns the cleansed data."""
         print("=" * 50)
         print("Wise Statement Cleansing Pipeline")
         print("=" * 50)
@@ -178,6 +222,18 @@ class WiseDataCleaner:
         print(f"Output: {len(df_cleansed)} transactions")
         print("=" * 50)
 
+        return df_cleansed
+
+
+def get_statement_keys(base_path: str):
+    """Return the raw statement key and a new timestamped cleansed key."""
+    # Generate timestamp for filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    input_key = f"{base_path}/raw/statement_29519495_GBP_2025-01-01_2025-07-25.csv"
+    output_key = f"{base_path}/cleansed/wise_transactions_cleansed_{timestamp}.parquet"
+    return input_key, output_key
+
 
 def main():
     """Main execution function."""
@@ -188,13 +244,9 @@ def main():
         except ImportError:
             ENVIRONMENT = "develop"  # Default to develop
 
-        # Generate timestamp for filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
         # Configuration based on environment
         base_path = f"{ENVIRONMENT}/bank-statements/wise-gbp"
-        input_key = f"{base_path}/raw/statement_29519495_GBP_2025-01-01_2025-07-25.csv"
-        output_key = f"{base_path}/cleansed/wise_transactions_cleansed_{timestamp}.csv"
+        input_key, output_key = get_statement_keys(base_path)
 
         print(f"Environment: {ENVIRONMENT}")
         print(f"Input path: {input_key}")
@@ -1,46 +1,38 @@
 # wise/run_pipeline.py
-import subprocess
 import sys
-import os
 
-
-def run_script(script_path):
-    """Executes a Python script using the same interpreter and checks for errors."""
-    print(f"--- Running {os.path.basename(script_path)} ---")
-    try:
-        # Ensure the script is run with the same python executable
-        # This is important for virtual environments
-        result = subprocess.run(
-            [sys.executable, script_path], check=True, text=True, capture_output=True
-        )
-        print(result.stdout)
-        if result.stderr:
-            print("--- Stderr ---")
-            print(result.stderr)
-        print(f"--- Finished {os.path.basename(script_path)} ---")
-    except subprocess.CalledProcessError as e:
-        print(f"!!! ERROR while running {script_path} !!!")
-        print(e.stdout)
-        print(e.stderr)
-        sys.exit(1)
+from wise.cleansed.create_wise_cleansed_tables import (
+    WiseDataCleaner,
+    get_statement_keys,
+)
+from wise.staging.create_wise_staging_tables import WiseStagingTables
 
 
 def main():
     """Runs the full Wise data processing pipeline."""
     print("Starting Wise Data Pipeline...")
 
-    # Get the directory of the current script to reliably locate other scripts
-    pipeline_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        # Get environment from secrets
+        try:
+            from configuration.secrets import ENVIRONMENT
+        except ImportError:
+            ENVIRONMENT = "develop"  # Default to develop
 
-    cleansing_script = os.path.join(
-        pipeline_dir, "cleansed", "create_wise_cleansed_tables.py"
-    )
-    staging_script = os.path.join(
-        pipeline_dir, "staging", "create_wise_staging_tables.py"
-    )
+        base_path = f"{ENVIRONMENT}/bank-statements/wise-gbp"
+        input_key, output_key = get_statement_keys(base_path)
 
-    run_script(cleansing_script)
-    run_script(staging_script)
+        # Both stages run in this process and share one S3 client, and the
+        # cleansed data is handed straight to staging rather than re-read
+        cleaner = WiseDataCleaner()
+        df_cleansed = cleaner.process_wise_statement(input_key, output_key)
+
+        staging = WiseStagingTables(s3=cleaner.s3)
+        staging.process_staging_tables(base_path, df_cleansed=df_cleansed)
+
+    except Exception as e:
+        print(f"!!! ERROR while running the Wise pipeline: {e} !!!")
+        sys.exit(1)
 
     print("Wise Data Pipeline completed successfully!")
 
@@ -4,41 +4,47 @@ Create Wise staging tables from cleansed transaction data.
 Generates daily and monthly balance summaries for dashboard.
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import glob
 from datetime import datetime
 from typing import List, Optional
 import sys
-import os
-
-# Add parent directory to path for S3 connector
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
 
 from aws.connect_to_s3 import S3Helper
+from wise.cleansed.create_wise_cleansed_tables import LATEST_MANIFEST
 
 
 class WiseStagingTables:
     """Create staging tables from cleansed Wise data."""
 
-    def __init__(self):
-        self.s3 = S3Helper()
+    def __init__(self, s3: Optional[S3Helper] = None):
+        self.s3 = s3 or S3Helper()
 
     def find_latest_cleansed_file(self, base_path: str) -> str:
-        """Find the most recent cleansed file by timestamp."""
+        """Find the most recent cleansed file, via the manifest when present."""
         try:
-            # List all cleansed files
-            files = self.s3.list_files(
-                prefix=f"{base_path}/cleansed/wise_transactions_cleansed_"
+            # Read the newest key from the manifest written by the cleansed stage
+            # with a single GET; only a missing manifest falls back to listing
+            latest_file = self.s3.read_text_from_s3(
+                f"{base_path}/cleansed/{LATEST_MANIFEST}", missing_ok=True
             )
 
-            if not files:
-                raise FileNotFoundError("No cleansed files found")
+            if latest_file:
+                latest_file = latest_file.strip()
+            else:
+                # No manifest yet: list all cleansed files
+                files = self.s3.list_files(
+                    prefix=f"{base_path}/cleansed/wise_transactions_cleansed_"
+                )
+
+                if not files:
+                    raise FileNotFoundError("No cleansed files found")
 
-            # Sort by filename (timestamp) to get latest
-            files.sort(reverse=True)
-            latest_file = files[0]
+                # Sort by filename (timestamp) to get latest
+                files.sort(reverse=True)
+                latest_file = files[0]
 
             print(f"Found latest cleansed file: {latest_file}")
             return latest_file
@@ -50,11 +56,16 @@ class WiseStagingTables:
         """Load cleansed transaction data from S3."""
         try:
             print(f"Loading cleansed data from: {file_key}")
-            df = self.s3.read_csv_from_s3(file_key)
-
-            # Convert datetime to pandas datetime
-            df["datetime"] = pd.to_datetime(df["datetime"])
-            df["date"] = df["datetime"].dt.date
+            if file_key.endswith(".parquet"):
+                # Parquet keeps the datetime dtype, so no parsing is needed
+                df = self.s3.read_parquet_from_s3(file_key)
+            else:
+                # Older cleansed CSVs hold ISO 8601 datetimes
+                df = self.s3.read_arrow_csv_from_s3(
+                    file_key,
+                    timestamp_columns=["datetime"],
+                    column_types={"transaction_type": pa.string()},
+                )
 
             print(f"Loaded {len(df)} transactions")
             return df
@@ -72,19 +83,21 @@ class WiseStagingTables:
             if field not in df.columns:
                 raise ValueError(f"Missing required field: {field}")
 
+        # Count nulls in one pass over the checked columns
+        null_counts = df[["datetime", "amount"]].isna().sum()
+
         # Check for valid dates
-        if df["datetime"].isnull().any():
+        if null_counts["datetime"]:
             print("Warning: Found transactions with null datetime")
 
         # Check for valid amounts
-        if df["amount"].isnull().any():
+        if null_counts["amount"]:
             print("Warning: Found transactions with null amounts")
 
         # Check transaction types
         type_counts = df["transaction_type"].value_counts()
         print("Transaction type distribution:")
-        for ttype, count in type_counts.items():
-            print(f"  {ttype}: {count}")
+        print(type_counts.rename_axis(None).to_string())
 
         print("Cleansed data validation passed")
         return True
@@ -93,49 +106,65 @@ class WiseStagingTables:
         """Calculate daily balance summaries."""
         print("Calculating daily balances...")
 
-        # Group by date
-        daily_data = []
-
-        for date, group in df.groupby("date"):
-            # Sort by datetime within the day
-            group = group.sort_values("datetime")
-
-            # Get first and last transactions of the day
-            first_txn = group.iloc[0]
-            last_txn = group.iloc[-1]
-
-            # Calculate opening balance (first transaction's running balance - amount)
-            opening_balance = first_txn["running_balance"] - first_txn["amount"]
-            closing_balance = last_txn["running_balance"]
-
-            # Calculate net change
-            net_change = closing_balance - opening_balance
-
-            # Sum amounts by transaction type
-            deposits = group[group["transaction_type"] == "transfer_in"]["amount"].sum()
-            withdrawals = abs(
-                group[group["transaction_type"].isin(["transfer_out", "card"])][
-                    "amount"
-                ].sum()
-            )
-            fees = abs(group[group["transaction_type"] == "fee"]["amount"].sum())
-
-            daily_data.append(
+        # Sort once so each day's first and last rows are its earliest and latest
+        # transactions; days stay datetime64 so grouping hashes int64 values
+        df = df.assign(date=df["datetime"].dt.floor("D")).sort_values(
+            "datetime", kind="stable"
+        )
+        days = df.groupby("date", sort=True).size()
+
+        # Work in whole pence so sums are exact integers and need no rounding
+        df = df.assign(
+            amount=df["amount"].mul(100).round().astype("Int64"),
+            running_balance=df["running_balance"].mul(100).round().astype("Int64"),
+        )
+
+        # Get first and last transactions of each day, aligned to the sorted days
+        first_txn = df.drop_duplicates("date", keep="first").set_index("date")
+        first_txn = first_txn.reindex(days.index)
+        last_txn = df.drop_duplicates("date", keep="last").set_index("date")
+        last_txn = last_txn.reindex(days.index)
+
+        # Calculate opening balance (first transaction's running balance - amount)
+        opening_balance = first_txn["running_balance"] - first_txn["amount"]
+        closing_balance = last_txn["running_balance"]
+
+        # Sum amounts by transaction type in one groupby, zeroing the other types
+        transaction_type = df["transaction_type"]
+        type_sums = (
+            pd.DataFrame(
                 {
-                    "date": date.strftime("%Y-%m-%d"),
-                    "opening_balance": round(opening_balance, 2),
-                    "closing_balance": round(closing_balance, 2),
-                    "net_change": round(net_change, 2),
-                    "transaction_count": len(group),
-                    "deposits": round(deposits, 2),
-                    "withdrawals": round(withdrawals, 2),
-                    "fees": round(fees, 2),
+                    "deposits": df["amount"].where(
+                        transaction_type.eq("transfer_in"), 0
+                    ),
+                    "withdrawals": df["amount"].where(
+                        transaction_type.isin(["transfer_out", "card"]), 0
+                    ),
+                    "fees": df["amount"].where(transaction_type.eq("fee"), 0),
                 }
             )
-
-        # Create DataFrame and sort by date
-        daily_df = pd.DataFrame(daily_data)
-        daily_df = daily_df.sort_values("date")
+            .groupby(df["date"], sort=True)
+            .sum()
+        )
+
+        def to_pounds(pence: pd.Series) -> np.ndarray:
+            """Convert integer pence to float pounds, keeping missing values as NaN."""
+            return (pence / 100).to_numpy(dtype="float64", na_value=np.nan)
+
+        daily_df = pd.DataFrame(
+            {
+                "date": days.index.as_unit("ns"),
+                "opening_balance": to_pounds(opening_balance),
+                "closing_balance": to_pounds(closing_balance),
+                # Calculate net change
+                "net_change": to_pounds(closing_balance - opening_balance),
+                "transaction_count": days.to_numpy(),
+                "deposits": to_pounds(type_sums["deposits"]),
+                # Outgoing totals are reported as positive amounts per day
+                "withdrawals": to_pounds(type_sums["withdrawals"].abs()),
+                "fees": to_pounds(type_sums["fees"].abs()),
+            }
+        )
 
         print(f"Calculated daily balances for {len(daily_df)} days")
         return daily_df
@@ -162,27 +191,34 @@ class WiseStagingTables:
             # Generate timestamp for filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
+            # Narrow the count; the date is already datetime64 and amounts stay
+            # float64 so balances keep exact pence
+            parquet_df = daily_df.astype({"transaction_count": "int32"})
+
             # Save daily balances
-            daily_key = f"{base_path}/staging/wise_balance_daily_{timestamp}.csv"
+            daily_key = f"{base_path}/staging/wise_balance_daily_{timestamp}.parquet"
             print(f"Saving daily balances to: {daily_key}")
-            self.s3.upload_csv_to_s3(daily_df, daily_key, index=False)
+            self.s3.upload_parquet_to_s3(parquet_df, daily_key, index=False)
 
             print("Staging table saved successfully")
 
         except Exception as e:
             raise RuntimeError(f"Failed to save staging data: {str(e)}")
 
-    def process_staging_tables(self, base_path: str):
-        """Main processing pipeline."""
+    def process_staging_tables(
+        self, base_path: str, df_cleansed: Optional[pd.DataFrame] = None
+    ):
+        """Main processing pipeline. Reuses df_cleansed instead of reloading it from S3 when given."""
         print("=" * 50)
         print("Wise Staging Tables Pipeline")
         print("=" * 50)
 
-        # Find latest cleansed file
-        latest_file = self.find_latest_cleansed_file(base_path)
+        if df_cleansed is None:
+            # Find latest cleansed file
+            latest_file = self.find_latest_cleansed_file(base_path)
 
-        # Load cleansed data
-        df_cleansed = self.load_cleansed_data(latest_file)
+            # Load cleansed data
+            df_cleansed = self.load_cleansed_data(latest_file)
 
         # Validate cleansed data
         self.validate_cleansed_data(df_cleansed)